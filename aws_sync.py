@@ -3,17 +3,104 @@
 AI Hangout AWS Backup & Sync - Unified with MK Copilot AWS Setup
 Syncs AI Hangout data to AWS for backup, scaling, and integration
 """
+import base64
 import boto3
+import functools
+import gzip
+import hashlib
+import io
 import json
 import os
+import random
+import tempfile
+import threading
+import time
 from datetime import datetime
-from typing import Dict, List, Any
-import requests
+from typing import Any, Dict, Iterator, List, Optional, Union
+import httpx
+import orjson
+from boto3.dynamodb.types import TypeSerializer
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+from concurrent.futures import ThreadPoolExecutor
 
 # AWS Configuration
 AWS_REGION = os.getenv("AWS_REGION", "us-east-1")
 AIHANGOUT_BUCKET = os.getenv("AIHANGOUT_S3_BUCKET", "ai-army-data")
 WORKER_URL = "https://aihangout-ai.rblake2320.workers.dev"
+# Default lives in the temp dir: Lambda's working directory (/var/task) is read-only
+SYNC_STATE_FILE = os.getenv(
+    "AIHANGOUT_SYNC_STATE_FILE",
+    os.path.join(tempfile.gettempdir(), "aihangout_sync_state.json")
+)
+# Only the columns sync_to_dynamodb stores
+SYNC_PROBLEM_FIELDS = "id,title,description,category,upvotes,username,ai_agent_type,created_at"
+HTTP_TIMEOUT = httpx.Timeout(30.0, connect=3.0)
+# Transient Worker/Cloudflare responses worth retrying (transport retries only cover connect errors)
+HTTP_RETRY_STATUSES = frozenset({429, 502, 503, 504})
+HTTP_MAX_ATTEMPTS = 4
+HTTP_BACKOFF_FACTOR = 0.3
+DYNAMODB_WRITE_WORKERS = 4
+DYNAMODB_BATCH_SIZE = 25  # BatchWriteItem hard limit
+DYNAMODB_MAX_BATCH_ATTEMPTS = 8
+S3_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=8 * 1024 * 1024,
+    multipart_chunksize=8 * 1024 * 1024,
+    max_concurrency=4,
+    use_threads=True
+)
+# Adaptive retries back off on ProvisionedThroughputExceededException
+DYNAMODB_RETRY_CONFIG = Config(retries={'mode': 'adaptive', 'max_attempts': 10})
+
+# Credentials are probed once per TTL window, not once per AIHangoutAWSSync(),
+# so long-running schedulers still re-verify occasionally
+CREDENTIALS_CHECK_TTL = 3600  # seconds
+_credentials_checked_at: Optional[float] = None
+
+# One boto3 session for every client, so botocore loads service models once
+_SESSION = boto3.session.Session()
+
+_TYPE_SERIALIZER = TypeSerializer()
+
+# Guards the load -> write -> save cycle of sync_to_dynamodb
+_SYNC_LOCK = threading.Lock()
+
+class _MD5BytesIO(io.BytesIO):
+    """BytesIO that keeps a running MD5 of everything written to it"""
+
+    def __init__(self):
+        super().__init__()
+        self.md5 = hashlib.md5(usedforsecurity=False)
+
+    def write(self, b) -> int:
+        self.md5.update(b)
+        return super().write(b)
+
+@functools.lru_cache(maxsize=None)
+def _client(service: str, region: str = AWS_REGION):
+    """Process-wide boto3 client - construction loads botocore service models"""
+    return _SESSION.client(service, region_name=region)
+
+@functools.lru_cache(maxsize=None)
+def _dynamodb_resource(region: str = AWS_REGION):
+    """Process-wide DynamoDB resource"""
+    return _SESSION.resource('dynamodb', region_name=region, config=DYNAMODB_RETRY_CONFIG)
+
+def verify_credentials():
+    """Probe AWS credentials via STS at most once per CREDENTIALS_CHECK_TTL
+
+    Raises whatever STS raises when the credentials are invalid. Long-lived
+    callers should call this per tick; constructing AIHangoutAWSSync also
+    calls it.
+    """
+    global _credentials_checked_at
+    now = time.monotonic()
+    if _credentials_checked_at is not None and now - _credentials_checked_at <= CREDENTIALS_CHECK_TTL:
+        return
+    _credentials_checked_at = None
+    _client('sts', AWS_REGION).get_caller_identity()
+    _credentials_checked_at = now
 
 class AIHangoutAWSSync:
     """Unified AWS integration for AI Hangout matching MK Copilot setup"""
@@ -23,23 +110,107 @@ class AIHangoutAWSSync:
         self.lambda_client = None
         self.bedrock = None
         self.dynamodb = None
+        self.http = self._init_http_session()
         self._init_aws_clients()
 
+    def _init_http_session(self) -> httpx.Client:
+        """Pooled HTTP/2 client so Worker calls multiplex over one TLS connection"""
+        transport = httpx.HTTPTransport(
+            http2=True,
+            retries=3,
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=4)
+        )
+        return httpx.Client(
+            transport=transport,
+            timeout=HTTP_TIMEOUT,
+            headers={"Accept-Encoding": "gzip"}
+        )
+
+    def _get(self, url: str, **kwargs) -> httpx.Response:
+        """GET from the Worker, retrying transient status codes with exponential backoff"""
+        for attempt in range(HTTP_MAX_ATTEMPTS):
+            response = self.http.get(url, **kwargs)
+            if response.status_code not in HTTP_RETRY_STATUSES or attempt == HTTP_MAX_ATTEMPTS - 1:
+                return response
+            time.sleep(HTTP_BACKOFF_FACTOR * 2 ** attempt)
+
     def _init_aws_clients(self):
         """Initialize AWS clients with error handling"""
         try:
             # Test AWS credentials
-            boto3.client('sts').get_caller_identity()
+            verify_credentials()
 
-            self.s3 = boto3.client('s3', region_name=AWS_REGION)
-            self.lambda_client = boto3.client('lambda', region_name=AWS_REGION)
-            self.bedrock = boto3.client('bedrock-runtime', region_name=AWS_REGION)
-            self.dynamodb = boto3.resource('dynamodb', region_name=AWS_REGION)
+            self.s3 = _client('s3', AWS_REGION)
+            self.lambda_client = _client('lambda', AWS_REGION)
+            self.bedrock = _client('bedrock-runtime', AWS_REGION)
+            self.dynamodb = _dynamodb_resource(AWS_REGION)
             print("[SUCCESS] AWS clients initialized successfully")
 
         except Exception as e:
             print(f"[ERROR] AWS not configured: {e}")
 
+    def _upload_json_gz(self, key: str, data: Dict[str, Any], metadata: Optional[Dict[str, str]] = None):
+        """Upload compact gzipped JSON to S3 (multipart for large payloads)"""
+        buf = _MD5BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode='wb') as gz:
+            gz.write(orjson.dumps(data))
+        size = buf.tell()
+        buf.seek(0)
+
+        extra_args = {
+            'ContentType': 'application/json',
+            'ContentEncoding': 'gzip',
+            'ServerSideEncryption': 'AES256',
+            'Metadata': metadata or {}
+        }
+
+        # Single-part uploads carry the MD5 computed while gzipping, so the
+        # body is hashed once; multipart parts are checksummed by boto3
+        if size < S3_TRANSFER_CONFIG.multipart_threshold:
+            self.s3.put_object(
+                Bucket=AIHANGOUT_BUCKET,
+                Key=key,
+                Body=buf,
+                ContentMD5=base64.b64encode(buf.md5.digest()).decode('ascii'),
+                **extra_args
+            )
+        else:
+            self.s3.upload_fileobj(buf, AIHANGOUT_BUCKET, key, ExtraArgs=extra_args, Config=S3_TRANSFER_CONFIG)
+
+    def _backup_if_changed(self, prefix: str, name: str, now: datetime,
+                           data: Dict[str, Any], content: Any) -> Optional[str]:
+        """Upload a dated backup unless content matches the latest one
+
+        The content hash is kept in the metadata of <prefix>/latest.json.gz,
+        so an unchanged backup costs a single HEAD request. The dated object
+        is written first and then copied onto latest, so latest never claims
+        content that has no dated backup. Returns the dated S3 key, or None
+        when the upload was skipped.
+        """
+        digest = hashlib.sha256(orjson.dumps(content, option=orjson.OPT_SORT_KEYS)).hexdigest()
+        latest_key = f"{prefix}/latest.json.gz"
+
+        try:
+            head = self.s3.head_object(Bucket=AIHANGOUT_BUCKET, Key=latest_key)
+            if head.get('Metadata', {}).get('content-sha256') == digest:
+                return None
+        except ClientError as e:
+            # Without s3:ListBucket, S3 reports a missing key as 403 rather
+            # than 404; treat both as "no previous backup". A real permission
+            # problem still surfaces from the upload below.
+            if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', '403', 'AccessDenied'):
+                raise
+
+        key = f"{prefix}/{now.strftime('%Y/%m/%d')}/{name}-{int(now.timestamp())}.json.gz"
+        self._upload_json_gz(key, data, metadata={'content-sha256': digest})
+        self.s3.copy_object(
+            Bucket=AIHANGOUT_BUCKET,
+            Key=latest_key,
+            CopySource={'Bucket': AIHANGOUT_BUCKET, 'Key': key},
+            ServerSideEncryption='AES256'
+        )
+        return key
+
     def backup_problems_to_s3(self) -> Dict[str, Any]:
         """Backup all problems and solutions to S3"""
         if not self.s3:
@@ -47,30 +218,26 @@ class AIHangoutAWSSync:
 
         try:
             # Fetch problems from AI Hangout API
-            response = requests.get(f"{WORKER_URL}/api/problems?limit=1000")
+            response = self._get(f"{WORKER_URL}/api/problems?limit=1000")
             if response.status_code != 200:
                 return {"error": f"Failed to fetch problems: {response.status_code}"}
 
-            data = response.json()
+            data = orjson.loads(response.content)
+            now = datetime.utcnow()
             backup_data = {
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": now.isoformat(),
                 "problems": data.get("problems", []),
                 "backup_type": "full_problems_backup"
             }
 
-            # Upload to S3
-            key = f"ai-hangout/backups/problems/{datetime.utcnow().strftime('%Y/%m/%d')}/problems-{int(datetime.utcnow().timestamp())}.json"
-
-            self.s3.put_object(
-                Bucket=AIHANGOUT_BUCKET,
-                Key=key,
-                Body=json.dumps(backup_data, indent=2),
-                ContentType='application/json',
-                ServerSideEncryption='AES256'
+            # Upload to S3, skipping it when nothing changed since the last backup
+            key = self._backup_if_changed(
+                "ai-hangout/backups/problems", "problems", now, backup_data, backup_data["problems"]
             )
 
             return {
                 "success": True,
+                "skipped": key is None,
                 "s3_key": key,
                 "problems_count": len(backup_data["problems"]),
                 "timestamp": backup_data["timestamp"]
@@ -86,31 +253,27 @@ class AIHangoutAWSSync:
 
         try:
             # Fetch AI learning data
-            response = requests.get(f"{WORKER_URL}/api/ai/learning-data")
+            response = self._get(f"{WORKER_URL}/api/ai/learning-data")
             if response.status_code != 200:
                 return {"error": f"Failed to fetch learning data: {response.status_code}"}
 
-            data = response.json()
+            data = orjson.loads(response.content)
+            now = datetime.utcnow()
             learning_backup = {
-                "timestamp": datetime.utcnow().isoformat(),
+                "timestamp": now.isoformat(),
                 "learning_data": data.get("learningData", []),
                 "count": data.get("count", 0),
                 "backup_type": "ai_learning_data"
             }
 
-            # Upload to S3
-            key = f"ai-hangout/ai-learning/{datetime.utcnow().strftime('%Y/%m/%d')}/learning-{int(datetime.utcnow().timestamp())}.json"
-
-            self.s3.put_object(
-                Bucket=AIHANGOUT_BUCKET,
-                Key=key,
-                Body=json.dumps(learning_backup, indent=2),
-                ContentType='application/json',
-                ServerSideEncryption='AES256'
+            # Upload to S3, skipping it when nothing changed since the last backup
+            key = self._backup_if_changed(
+                "ai-hangout/ai-learning", "learning", now, learning_backup, learning_backup["learning_data"]
             )
 
             return {
                 "success": True,
+                "skipped": key is None,
                 "s3_key": key,
                 "learning_records": learning_backup["count"],
                 "timestamp": learning_backup["timestamp"]
@@ -120,92 +283,225 @@ class AIHangoutAWSSync:
             return {"error": f"Analytics backup failed: {str(e)}"}
 
     def sync_to_dynamodb(self, table_name: str = "ai-hangout-problems") -> Dict[str, Any]:
-        """Sync problems to DynamoDB for real-time access"""
+        """Sync new or changed problems to DynamoDB for real-time access"""
         if not self.dynamodb:
             return {"error": "AWS DynamoDB not available"}
 
-        try:
-            table = self.dynamodb.Table(table_name)
-
-            # Fetch recent problems
-            response = requests.get(f"{WORKER_URL}/api/problems?limit=50")
-            if response.status_code != 200:
-                return {"error": f"Failed to fetch problems: {response.status_code}"}
-
-            problems = response.json().get("problems", [])
-
-            # Batch write to DynamoDB
-            with table.batch_writer() as batch:
+        # Full backups and quick syncs may overlap; serialize them so both
+        # don't diff against the same state and write the same rows twice
+        with _SYNC_LOCK:
+            try:
+                state = self._load_sync_state()
+                table_state = state.get(table_name, {})
+
+                # Fetch recent problems - Worker answers 304 when the listing is unchanged
+                headers = {"If-None-Match": table_state["etag"]} if table_state.get("etag") else {}
+                response = self._get(
+                    f"{WORKER_URL}/api/problems?limit=50&fields={SYNC_PROBLEM_FIELDS}",
+                    headers=headers
+                )
+                if response.status_code == 304:
+                    return {
+                        "success": True,
+                        "table_name": table_name,
+                        "synced_problems": 0,
+                        "unchanged": True,
+                        "timestamp": datetime.utcnow().isoformat()
+                    }
+                if response.status_code != 200:
+                    return {"error": f"Failed to fetch problems: {response.status_code}"}
+
+                problems = orjson.loads(response.content).get("problems", [])
+
+                # Only write rows whose content changed since the last sync.
+                # Changed rows go straight to client-level PutRequests; last_sync
+                # is serialized once and shared by every row.
+                last_sync = datetime.utcnow().isoformat()
+                last_sync_attr = _TYPE_SERIALIZER.serialize(last_sync)
+                serialize = _TYPE_SERIALIZER.serialize
+                previous_hashes = table_state.get("hashes", {})
+                hashes = {}
+                put_requests = []
                 for problem in problems:
+                    problem_id = str(problem['id'])
                     item = {
-                        'problem_id': str(problem['id']),
+                        'problem_id': problem_id,
                         'title': problem['title'],
                         'description': problem['description'],
                         'category': problem.get('category', 'other'),
                         'upvotes': problem.get('upvotes', 0),
                         'username': problem['username'],
                         'ai_agent_type': problem['ai_agent_type'],
-                        'created_at': problem['created_at'],
-                        'last_sync': datetime.utcnow().isoformat()
+                        'created_at': problem['created_at']
                     }
-                    batch.put_item(Item=item)
-
-            return {
-                "success": True,
-                "table_name": table_name,
-                "synced_problems": len(problems),
-                "timestamp": datetime.utcnow().isoformat()
-            }
-
-        except Exception as e:
-            return {"error": f"DynamoDB sync failed: {str(e)}"}
+                    digest = hashlib.sha256(orjson.dumps(item, option=orjson.OPT_SORT_KEYS)).hexdigest()
+                    hashes[problem_id] = digest
+                    if previous_hashes.get(problem_id) != digest:
+                        attributes = serialize(item)['M']
+                        attributes['last_sync'] = last_sync_attr
+                        put_requests.append({'PutRequest': {'Item': attributes}})
+
+                if put_requests:
+                    # Send 25-item BatchWriteItem chunks straight through the
+                    # client, running the chunks concurrently
+                    chunks = [
+                        put_requests[i:i + DYNAMODB_BATCH_SIZE]
+                        for i in range(0, len(put_requests), DYNAMODB_BATCH_SIZE)
+                    ]
+                    with ThreadPoolExecutor(max_workers=DYNAMODB_WRITE_WORKERS) as executor:
+                        futures = [
+                            executor.submit(self._write_batch, table_name, chunk)
+                            for chunk in chunks
+                        ]
+                        for future in futures:
+                            future.result()
+
+                # The rows are already written; failing to record state only means
+                # the next sync rewrites them, so don't report the sync as failed
+                try:
+                    state[table_name] = {"etag": response.headers.get("ETag"), "hashes": hashes}
+                    self._save_sync_state(state)
+                except OSError as e:
+                    print(f"[WARNING] Could not save sync state to {SYNC_STATE_FILE}: {e}")
+
+                return {
+                    "success": True,
+                    "table_name": table_name,
+                    "synced_problems": len(put_requests),
+                    "unchanged_problems": len(problems) - len(put_requests),
+                    "timestamp": last_sync
+                }
+
+            except Exception as e:
+                return {"error": f"DynamoDB sync failed: {str(e)}"}
+
+    def _load_sync_state(self) -> Dict[str, Any]:
+        """Load the ETag and per-problem hashes recorded by the last sync, keyed by table name"""
+        try:
+            with open(SYNC_STATE_FILE, 'rb') as f:
+                state = orjson.loads(f.read())
+        except (OSError, orjson.JSONDecodeError):
+            return {}
+        # Files from before state was keyed by table start over with a full sync
+        return {} if "hashes" in state else state
+
+    def _save_sync_state(self, state: Dict[str, Any]):
+        """Persist sync state atomically so a crash never leaves a partial file"""
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=".aihangout_sync_state.", dir=os.path.dirname(os.path.abspath(SYNC_STATE_FILE))
+        )
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(orjson.dumps(state))
+            os.replace(tmp_path, SYNC_STATE_FILE)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+
+    def _write_batch(self, table_name: str, put_requests: List[Dict[str, Any]]):
+        """Send one BatchWriteItem chunk, re-queueing UnprocessedItems with jittered backoff"""
+        pending = {table_name: put_requests}
+        for attempt in range(DYNAMODB_MAX_BATCH_ATTEMPTS):
+            response = self.dynamodb.meta.client.batch_write_item(RequestItems=pending)
+            pending = response.get('UnprocessedItems') or {}
+            if not pending:
+                return
+            if attempt < DYNAMODB_MAX_BATCH_ATTEMPTS - 1:
+                time.sleep(random.uniform(0, min(5.0, 0.05 * 2 ** attempt)))
+
+        unprocessed = len(pending.get(table_name, []))
+        raise RuntimeError(f"{unprocessed} items still unprocessed after {DYNAMODB_MAX_BATCH_ATTEMPTS} attempts")
+
+    def invoke_bedrock_analysis(self, prompt: str, collect: bool = True) -> Union[Dict[str, Any], Iterator[str]]:
+        """Use AWS Bedrock for AI analysis of problems/solutions
+
+        With collect=False, returns a generator yielding text as the model
+        produces it instead of waiting for the full completion. Unlike the
+        collected path, which returns an error dict, the streaming path
+        raises: RuntimeError when Bedrock is not configured, and any
+        Bedrock/botocore error while iterating.
+        """
+        if not collect:
+            if not self.bedrock:
+                raise RuntimeError("AWS Bedrock not available")
+            return self._stream_bedrock_text(prompt)
 
-    def invoke_bedrock_analysis(self, prompt: str) -> Dict[str, Any]:
-        """Use AWS Bedrock for AI analysis of problems/solutions"""
         if not self.bedrock:
             return {"error": "AWS Bedrock not available"}
 
         try:
-            response = self.bedrock.invoke_model(
-                modelId="anthropic.claude-3-sonnet-20240229-v1:0",
-                body=json.dumps({
-                    "anthropic_version": "bedrock-2023-05-31",
-                    "max_tokens": 1024,
-                    "messages": [{"role": "user", "content": prompt}]
-                })
-            )
+            text = []
+            usage = {}
+            for event in self._stream_bedrock_events(prompt):
+                if event.get('type') == 'content_block_delta':
+                    text.append(event.get('delta', {}).get('text', ''))
+                elif event.get('type') == 'message_start':
+                    usage.update(event.get('message', {}).get('usage', {}))
+                elif event.get('type') == 'message_delta':
+                    usage.update(event.get('usage', {}))
 
-            result = json.loads(response['body'].read())
             return {
                 "success": True,
-                "response": result.get('content', [{}])[0].get('text', ''),
-                "usage": result.get('usage', {})
+                "response": ''.join(text),
+                "usage": usage
             }
 
         except Exception as e:
             return {"error": f"Bedrock analysis failed: {str(e)}"}
 
+    def _stream_bedrock_events(self, prompt: str) -> Iterator[Dict[str, Any]]:
+        """Yield decoded Bedrock response-stream events as they arrive"""
+        response = self.bedrock.invoke_model_with_response_stream(
+            modelId="anthropic.claude-3-sonnet-20240229-v1:0",
+            body=orjson.dumps({
+                "anthropic_version": "bedrock-2023-05-31",
+                "max_tokens": 1024,
+                "messages": [{"role": "user", "content": prompt}]
+            })
+        )
+        for event in response['body']:
+            chunk = event.get('chunk')
+            if chunk:
+                yield orjson.loads(chunk['bytes'])
+
+    def _stream_bedrock_text(self, prompt: str) -> Iterator[str]:
+        """Yield completion text deltas only"""
+        for event in self._stream_bedrock_events(prompt):
+            if event.get('type') == 'content_block_delta':
+                yield event.get('delta', {}).get('text', '')
+
     def create_scheduled_backup_lambda(self):
         """Deploy Lambda function for scheduled backups"""
         if not self.lambda_client:
             return {"error": "AWS Lambda not available"}
 
+        # The sync instance lives at module scope so its boto3 clients are
+        # built once per container and reused by every warm invocation
         lambda_code = '''
 import json
-import boto3
-import requests
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 def lambda_handler(event, context):
     # This Lambda runs daily to backup AI Hangout data
-    from ai_hangout_aws_sync import AIHangoutAWSSync
-
-    sync = AIHangoutAWSSync()
-
-    # Run backups
-    problems_backup = sync.backup_problems_to_s3()
-    analytics_backup = sync.backup_analytics_to_s3()
-    dynamodb_sync = sync.sync_to_dynamodb()
+    # Rebuild if AWS init failed (e.g. a transient STS error at cold start)
+    # so one bad init doesn't pin the container to "not available" errors
+    global sync
+    if not sync.s3:
+        sync.http.close()
+        sync = AIHangoutAWSSync()
+
+    # Run backups concurrently - each job is independent and I/O-bound
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        problems_future = executor.submit(sync.backup_problems_to_s3)
+        analytics_future = executor.submit(sync.backup_analytics_to_s3)
+        dynamodb_future = executor.submit(sync.sync_to_dynamodb)
+        problems_backup = problems_future.result()
+        analytics_backup = analytics_future.result()
+        dynamodb_sync = dynamodb_future.result()
 
     return {
         'statusCode': 200,
@@ -217,6 +513,11 @@ def lambda_handler(event, context):
             'timestamp': datetime.utcnow().isoformat()
         })
     }
+
+# Initialized during the Lambda init phase, after the handler is defined
+from ai_hangout_aws_sync import AIHangoutAWSSync
+
+sync = AIHangoutAWSSync()
 '''
 
         # This would deploy the Lambda function
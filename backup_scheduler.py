@@ -3,12 +3,17 @@
 AI Hangout Backup Scheduler - Automated AWS Backup System
 Matches MK Copilot backup infrastructure for unified AI Army data management
 """
-import schedule
-import time
-import json
+import glob
 import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import orjson
+from apscheduler.executors.pool import ThreadPoolExecutor as JobThreadPoolExecutor
+from apscheduler.schedulers.blocking import BlockingScheduler
+from apscheduler.triggers.cron import CronTrigger
 from datetime import datetime
-from aws_sync import AIHangoutAWSSync
+from aws_sync import AIHangoutAWSSync, verify_credentials
 
 # Setup logging
 logging.basicConfig(
@@ -21,37 +26,87 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Number of backup_summary_*.json files kept on disk
+BACKUP_SUMMARY_KEEP = 50
+
+class LazyJSON:
+    """Serializes its payload only if a log handler actually formats the record"""
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def __str__(self):
+        return orjson.dumps(self.payload).decode("utf-8")
+
+_sync = None
+_sync_lock = threading.Lock()
+
+def get_sync():
+    """Shared AIHangoutAWSSync so HTTP connections and AWS clients persist across ticks"""
+    global _sync
+    with _sync_lock:
+        # Rebuild if AWS was unavailable last time so ticks keep retrying,
+        # or if the periodic credential re-check fails
+        healthy = _sync is not None and bool(_sync.s3)
+        if healthy:
+            try:
+                verify_credentials()
+            except Exception as e:
+                logger.error("AWS credential check failed: %s", e)
+                healthy = False
+
+        if not healthy:
+            if _sync is not None:
+                _sync.http.close()
+            _sync = AIHangoutAWSSync()
+        return _sync
+
+def save_backup_summary(backup_summary, path):
+    """Write a summary atomically, then prune all but the newest summaries"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(orjson.dumps(backup_summary, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_path, path)
+
+    summaries = sorted(glob.glob("backup_summary_*.json"), key=os.path.getmtime)
+    for old_path in summaries[:-BACKUP_SUMMARY_KEEP]:
+        os.remove(old_path)
+
 def run_full_backup():
     """Run complete backup of AI Hangout data to AWS"""
     logger.info("Starting scheduled AI Hangout backup...")
 
-    sync = AIHangoutAWSSync()
-
-    # 1. Backup problems and solutions
-    logger.info("Backing up problems to S3...")
-    problems_result = sync.backup_problems_to_s3()
-
-    # 2. Backup analytics and learning data
-    logger.info("Backing up analytics to S3...")
-    analytics_result = sync.backup_analytics_to_s3()
+    sync = get_sync()
 
-    # 3. Sync to DynamoDB for real-time access
-    logger.info("Syncing to DynamoDB...")
-    dynamodb_result = sync.sync_to_dynamodb()
+    # Problems, analytics and DynamoDB hit independent endpoints/services,
+    # so run them concurrently and wait on the slowest
+    jobs = {
+        "problems_backup": sync.backup_problems_to_s3,
+        "analytics_backup": sync.backup_analytics_to_s3,
+        "dynamodb_sync": sync.sync_to_dynamodb
+    }
+    results = {}
+    logger.info("Backing up problems/analytics to S3 and syncing to DynamoDB...")
+    with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+        futures = {executor.submit(job): name for name, job in jobs.items()}
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
 
     # Log results
+    now = datetime.now()
     backup_summary = {
-        "timestamp": datetime.now().isoformat(),
-        "problems_backup": problems_result,
-        "analytics_backup": analytics_result,
-        "dynamodb_sync": dynamodb_result
+        "timestamp": now.isoformat(),
+        "problems_backup": results["problems_backup"],
+        "analytics_backup": results["analytics_backup"],
+        "dynamodb_sync": results["dynamodb_sync"]
     }
 
-    logger.info(f"Backup completed: {json.dumps(backup_summary, indent=2)}")
+    logger.info("Backup completed: %s", LazyJSON(backup_summary))
 
     # Save backup summary
-    with open(f"backup_summary_{int(datetime.now().timestamp())}.json", "w") as f:
-        json.dump(backup_summary, f, indent=2)
+    save_backup_summary(backup_summary, f"backup_summary_{int(now.timestamp())}.json")
 
     return backup_summary
 
@@ -59,10 +114,10 @@ def run_quick_sync():
     """Quick DynamoDB sync for real-time updates"""
     logger.info("Running quick DynamoDB sync...")
 
-    sync = AIHangoutAWSSync()
+    sync = get_sync()
     result = sync.sync_to_dynamodb()
 
-    logger.info(f"Quick sync completed: {json.dumps(result, indent=2)}")
+    logger.info("Quick sync completed: %s", LazyJSON(result))
     return result
 
 def main():
@@ -70,13 +125,20 @@ def main():
     logger.info("AI Hangout Backup Scheduler started")
     logger.info("Backup schedule:")
     logger.info("  - Full backup (S3 + DynamoDB): Every 6 hours")
-    logger.info("  - Quick sync (DynamoDB only): Every 30 minutes")
+    logger.info("  - Quick sync (DynamoDB only): Every 30 minutes, at :15 and :45")
+
+    # Jobs run on a worker pool so a slow full backup never delays quick syncs;
+    # overlapping runs of the same job are coalesced rather than queued
+    scheduler = BlockingScheduler(
+        executors={'default': JobThreadPoolExecutor(4)},
+        job_defaults={'coalesce': True, 'max_instances': 1, 'misfire_grace_time': 300}
+    )
 
     # Schedule full backups every 6 hours
-    schedule.every(6).hours.do(run_full_backup)
+    scheduler.add_job(run_full_backup, CronTrigger(hour='*/6'), id='full_backup')
 
-    # Schedule quick syncs every 30 minutes
-    schedule.every(30).minutes.do(run_quick_sync)
+    # Schedule quick syncs every 30 minutes, offset from the full backups at :00
+    scheduler.add_job(run_quick_sync, CronTrigger(minute='15,45'), id='quick_sync')
 
     # Run initial backup
     logger.info("Running initial backup...")
@@ -85,13 +147,11 @@ def main():
     # Keep scheduler running
     logger.info("Scheduler is running. Press Ctrl+C to stop.")
     try:
-        while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
-    except KeyboardInterrupt:
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
         logger.info("Backup scheduler stopped by user")
     except Exception as e:
-        logger.error(f"Scheduler error: {e}")
+        logger.error("Scheduler error: %s", e)
         raise
 
 if __name__ == "__main__":
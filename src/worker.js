@@ -751,6 +751,8 @@ router.get('/api/problems', async (request, env) => {
     const sortBy = url.searchParams.get('sortBy') || 'new'; // 🆕 DEFAULT TO NEWEST FIRST
     const limit = parseInt(url.searchParams.get('limit') || '20');
     const offset = parseInt(url.searchParams.get('offset') || '0');
+    // Optional projection, e.g. fields=id,title,created_at (used by AWS sync)
+    const fields = url.searchParams.get('fields');
 
     // Build WHERE conditions for both COUNT and main query
     let whereClause = ' WHERE p.status = ?';
@@ -827,16 +829,38 @@ router.get('/api/problems', async (request, env) => {
       .bind(...params)
       .all();
 
-    return new Response(JSON.stringify({
+    let results = problems.results;
+    if (fields) {
+      const keys = fields.split(',').map(f => f.trim()).filter(Boolean);
+      results = results.map(row => Object.fromEntries(keys.filter(k => k in row).map(k => [k, row[k]])));
+    }
+
+    const body = JSON.stringify({
       success: true,
-      problems: problems.results,
+      problems: results,
       total,
       page,
       totalPages,
       hasNext: page < totalPages,
       hasPrev: page > 1
-    }), {
-      headers: { ...corsHeaders, 'Content-Type': 'application/json' }
+    });
+
+    // ETag lets pollers (AWS sync) skip unchanged listings with a 304
+    const hashBuffer = await crypto.subtle.digest('SHA-256', new TextEncoder().encode(body));
+    const etag = '"' + Array.from(new Uint8Array(hashBuffer)).map(b => b.toString(16).padStart(2, '0')).join('') + '"';
+    // Weak comparison over the list: Cloudflare rewrites strong ETags to W/"..." when it compresses
+    const ifNoneMatch = (request.headers.get('If-None-Match') || '')
+      .split(',')
+      .map(tag => tag.trim().replace(/^W\//, ''));
+    if (ifNoneMatch.includes('*') || ifNoneMatch.includes(etag)) {
+      return new Response(null, {
+        status: 304,
+        headers: { ...corsHeaders, 'ETag': etag }
+      });
+    }
+
+    return new Response(body, {
+      headers: { ...corsHeaders, 'Content-Type': 'application/json', 'ETag': etag }
     });
 
   } catch (error) {